@@ -8,13 +8,45 @@ Multi-Client Chat Client (with file send)
 """
 
 import socket
+import mmap
+import selectors
 import threading
+import time
 import os
 import sys
 
 HOST = "127.0.0.1"
 PORT = 0  # leave zero -> prompt user to supply port or auto-detect below
 BUFFER_SIZE = 4096
+COALESCE_BYTES = 32 * 1024  # flush queued chat lines once this much is pending
+COALESCE_DELAY = 0.002  # ...or this many seconds after the first one was queued
+INPUT_ENCODING = getattr(sys.stdin, "encoding", None) or "utf-8"
+
+# stdin bytes read past the last prompted line, handed to chat_loop first
+typed_ahead = b""
+
+
+def prompt_line(prompt: str) -> str:
+    """
+    input() for the start-up prompts. Outside Windows it reads the stdin
+    file descriptor directly, as chat_loop does, and keeps anything past
+    the line in typed_ahead. With input(), lines piped in ahead would sit
+    in sys.stdin's own buffer, where the selector never sees them.
+    """
+    global typed_ahead
+    if sys.platform == "win32":
+        return input(prompt)
+    print(prompt, end="", flush=True)
+    data = typed_ahead
+    while b"\n" not in data:
+        chunk = os.read(sys.stdin.fileno(), BUFFER_SIZE)
+        if not chunk:
+            if not data:
+                raise EOFError
+            break
+        data += chunk
+    line, _, typed_ahead = data.partition(b"\n")
+    return line.decode(INPUT_ENCODING, errors="replace").rstrip("\r")
 
 
 def prompt_server_info():
@@ -22,25 +54,37 @@ def prompt_server_info():
     global PORT
     if PORT == 0:
         try:
-            PORT = int(input("Enter server port (from server console): ").strip())
+            PORT = int(prompt_line("Enter server port (from server console): ").strip())
         except Exception:
             print("Invalid port. Exiting.")
             sys.exit(1)
 
 
-def receive_loop(sock: socket.socket):
-    """Receive and print messages from server."""
-    try:
-        while True:
-            data = sock.recv(BUFFER_SIZE)
-            if not data:
-                print("🔌 Disconnected from server")
-                break
-            print(data.decode("utf-8", errors="ignore").rstrip())
-    except Exception as e:
-        print("Receive error:", e)
-    finally:
-        sock.close()
+def send_with_header(sock: socket.socket, header: bytes, f, size: int) -> None:
+    """
+    Send the FILE| `header` and then the `size` bytes of the open file `f`,
+    straight from a read-only mmap of it. Both go out in one sendmsg()
+    batch where the platform has sendmsg().
+    """
+    if size == 0:
+        sock.sendall(header)
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if not hasattr(sock, "sendmsg"):
+            sock.sendall(header)
+            sock.sendall(mm)
+            return
+        buffers = [memoryview(header), memoryview(mm)]
+        while buffers:
+            sent = sock.sendmsg(buffers)
+            # drop fully sent buffers and trim the partially sent one
+            while sent:
+                if sent >= len(buffers[0]):
+                    sent -= len(buffers[0])
+                    buffers.pop(0).release()
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
 
 
 def send_file(sock: socket.socket, filepath: str):
@@ -51,40 +95,128 @@ def send_file(sock: socket.socket, filepath: str):
     filename = os.path.basename(filepath)
     size = os.path.getsize(filepath)
     header = f"FILE|{filename}|{size}\n".encode("utf-8")
-    sock.sendall(header)
     with open(filepath, "rb") as f:
-        while chunk := f.read(BUFFER_SIZE):
-            sock.sendall(chunk)
+        send_with_header(sock, header, f, size)
     print(f"✅ Sent file: {filename} ({size} bytes)")
 
 
-def send_loop(sock: socket.socket, nickname: str):
-    """Read input from user and send either text or file command."""
-    try:
-        while True:
-            line = input()
+def pump_input(read):
+    """
+    Return (sock, recv) for a socket pair that a helper thread fills by
+    calling the blocking `read` until it returns b"". Used for input the
+    selector cannot watch directly.
+    """
+    rsock, wsock = socket.socketpair()
+
+    def pump():
+        try:
+            for data in iter(read, b""):
+                wsock.sendall(data)
+        finally:
+            wsock.close()
+
+    threading.Thread(target=pump, daemon=True).start()
+    return rsock, lambda: rsock.recv(BUFFER_SIZE)
+
+
+def open_input():
+    """
+    Return (fileobj, read) for user input that the selector can watch.
+    Windows can only select() on sockets, so there stdin lines are pumped
+    through a socket pair.
+    """
+    if sys.platform == "win32":
+        return pump_input(lambda: sys.stdin.readline().encode(INPUT_ENCODING))
+    fd = sys.stdin.fileno()
+    return fd, lambda: os.read(fd, BUFFER_SIZE)
+
+
+def chat_loop(sock: socket.socket, nickname: str):
+    """
+    Single-threaded client loop: print messages from the server and send
+    typed lines or /sendfile commands. Chat lines are coalesced and sent
+    with one sendall() once COALESCE_BYTES are pending or COALESCE_DELAY
+    has passed since the first of them was typed.
+    """
+    global typed_ahead
+    source, read_input = open_input()
+    sel = selectors.DefaultSelector()
+    partial = b""  # typed bytes not yet terminated by a newline
+    outbox = bytearray()
+    deadline = None
+
+    def flush():
+        nonlocal deadline
+        if outbox:
+            sock.sendall(outbox)
+            outbox.clear()
+        deadline = None
+
+    def handle_input(data: bytes):
+        nonlocal partial, deadline, outbox
+        *lines, partial = (partial + data).split(b"\n")
+        for raw in lines:
+            line = raw.decode(INPUT_ENCODING, errors="replace").rstrip("\r")
             if not line:
                 continue
             if line.startswith("/sendfile "):
                 _, path = line.split(" ", 1)
+                # earlier lines go first so the file bytes are not interleaved
+                flush()
                 send_file(sock, path.strip())
             else:
                 # send as normal chat message
-                message = f"{nickname}: {line}\n".encode("utf-8")
-                sock.sendall(message)
+                if deadline is None:
+                    deadline = time.monotonic() + COALESCE_DELAY
+                outbox += f"{nickname}: {line}\n".encode("utf-8")
+
+    try:
+        sel.register(sock, selectors.EVENT_READ)
+        try:
+            sel.register(source, selectors.EVENT_READ)
+        except PermissionError:
+            # epoll rejects regular files (stdin redirected from a file)
+            source, read_input = pump_input(read_input)
+            sel.register(source, selectors.EVENT_READ)
+        # Lines that arrived together with the prompts' answers
+        backlog, typed_ahead = typed_ahead, b""
+        handle_input(backlog)
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for key, _ in sel.select(timeout):
+                if key.fileobj is sock:
+                    data = sock.recv(BUFFER_SIZE)
+                    if not data:
+                        print("🔌 Disconnected from server")
+                        return
+                    print(data.decode("utf-8", errors="ignore").rstrip())
+                    continue
+                data = read_input()
+                if not data:
+                    return
+                handle_input(data)
+            if outbox and (len(outbox) >= COALESCE_BYTES or time.monotonic() >= deadline):
+                flush()
     except Exception as e:
-        print("Send error:", e)
+        print("Chat error:", e)
     finally:
+        try:
+            flush()
+        except OSError:
+            pass
+        sel.close()
         sock.close()
 
 
-if __name__ == "__main__":
-    nickname = input("Choose your nickname: ").strip()
+def main():
+    """Ask for a nickname and port, connect, and run the chat loop."""
+    nickname = prompt_line("Choose your nickname: ").strip()
     if not nickname:
         nickname = "Anonymous"
     prompt_server_info()
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client.connect((HOST, PORT))
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     # Wait for NICK request or send nickname immediately
     first = client.recv(BUFFER_SIZE).decode("utf-8", errors="ignore")
     if first.strip() == "NICK":
@@ -93,6 +225,8 @@ if __name__ == "__main__":
         # Unexpected server, but send nickname anyway
         client.sendall(nickname.encode("utf-8"))
 
-    # Start receiver and sender threads
-    threading.Thread(target=receive_loop, args=(client,), daemon=True).start()
-    send_loop(client, nickname)
+    chat_loop(client, nickname)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,176 +1,199 @@
 """
 Multi-Client Chat Server (with file receive)
 --------------------------------------------
-- Accepts multiple clients (thread per client).
+- Accepts multiple clients on a single-threaded asyncio event loop.
 - Supports text messages broadcast.
 - Supports file uploads from clients using a simple header protocol:
     FILE|<filename>|<size>\n  followed by raw bytes of <size>.
 - Received files are saved to ChatUploads/ folder.
 """
 
-import socket
-import threading
+import asyncio
 import os
+from dataclasses import dataclass
 
 HOST = "127.0.0.1"
 PORT = 0  # Let OS assign a free port
 BUFFER_SIZE = 4096
+MAX_LINE = 64 * 1024  # unterminated chat text is broadcast once this long
+SPOOL_SIZE = 1 << 20  # upload bytes buffered in memory between disk writes
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "ChatUploads")
 
-clients = []
-nicknames = []
-lock = threading.Lock()
+
+@dataclass
+class ClientInfo:
+    """A connected client's stream writer and chat nickname."""
+    writer: asyncio.StreamWriter
+    nickname: str
+
+
+# Keyed by socket fileno; only touched from the event loop thread, so no lock is needed
+clients: dict[int, ClientInfo] = {}
 
 
 def ensure_upload_dir():
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-def broadcast(message: str, exclude: socket.socket = None) -> None:
+async def broadcast(message: str, exclude: asyncio.StreamWriter = None) -> None:
     """Send a message (string) to all connected clients (optionally excluding one)."""
-    with lock:
-        for client in clients:
-            if client is not exclude:
-                try:
-                    client.send(message.encode("utf-8"))
-                except Exception:
-                    # Ignore send errors; client handler will clean up
-                    pass
-
-
-def receive_file(client_socket: socket.socket, filename: str, size: int) -> str:
+    payload = message.encode("utf-8")  # encode once, not per client
+    # Snapshot the targets: clients may join or leave while we await the drains
+    targets = [info.writer for info in clients.values() if info.writer is not exclude]
+    for client in targets:
+        try:
+            client.write(payload)
+        except Exception:
+            # Ignore send errors; client handler will clean up
+            pass
+    await asyncio.gather(*(client.drain() for client in targets), return_exceptions=True)
+
+
+async def receive_file(reader: asyncio.StreamReader, filename: str, size: int, initial_bytes: bytes = b"") -> str:
     """
-    Receive exactly `size` bytes from client_socket and save to UPLOAD_DIR.
+    Receive exactly `size` bytes from reader and save to UPLOAD_DIR.
+    `initial_bytes` (already read along with the header) are used first.
+    Data is collected in one preallocated buffer that is written out
+    whenever it fills, so files up to SPOOL_SIZE take one write.
     Returns the saved file path.
     """
     ensure_upload_dir()
     safe_name = os.path.basename(filename)
     out_path = os.path.join(UPLOAD_DIR, safe_name)
-    remaining = size
-    with open(out_path, "wb") as f:
+    initial_bytes = initial_bytes[:size]
+    buf = bytearray(min(size, SPOOL_SIZE))
+    filled = len(initial_bytes)
+    remaining = size - filled
+    with open(out_path, "wb") as f, memoryview(buf) as view:
+        view[:filled] = initial_bytes
         while remaining > 0:
-            chunk = client_socket.recv(min(BUFFER_SIZE, remaining))
+            chunk = await reader.read(min(len(buf) - filled, remaining))
             if not chunk:
                 break
-            f.write(chunk)
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
             remaining -= len(chunk)
+            if filled == len(buf):
+                f.write(view)
+                filled = 0
+        f.write(view[:filled])
     return out_path
 
 
-def handle_client(client_socket: socket.socket) -> None:
-    """Handle messages (and file uploads) from a single client."""
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, fileno: int) -> None:
+    """Handle messages (and file uploads) from the client stored under `fileno`."""
+    pending = b""  # bytes already read that belong to the next message or header
     try:
         while True:
-            data = client_socket.recv(BUFFER_SIZE)
+            data = pending or await reader.read(BUFFER_SIZE)
+            pending = b""
             if not data:
                 break
 
             # Check for file header (ASCII text)
             if data.startswith(b"FILE|"):
-                try:
-                    header, rest = data.split(b"\n", 1)
-                except ValueError:
-                    header = data.strip()
-                    rest = b""
+                header, sep, rest = data.partition(b"\n")
+                if not sep:
+                    # header split across reads
+                    header += (await reader.readuntil(b"\n"))[:-1]
 
                 parts = header.decode("utf-8").split("|", 2)
                 if len(parts) != 3:
-                    client_socket.send("ERROR|Invalid file header\n".encode("utf-8"))
+                    writer.write("ERROR|Invalid file header\n".encode("utf-8"))
                     continue
                 _, filename, size_str = parts
                 try:
                     size = int(size_str)
                 except ValueError:
-                    client_socket.send("ERROR|Invalid file size\n".encode("utf-8"))
+                    size = -1
+                if size < 0:
+                    writer.write("ERROR|Invalid file size\n".encode("utf-8"))
                     continue
 
-                temp_path = receive_file_with_initial(client_socket, filename, size, rest)
+                # Anything after the file's bytes is the start of the next message
+                pending = rest[size:]
+                temp_path = await receive_file(reader, filename, size, rest[:size])
 
-                with lock:
-                    try:
-                        idx = clients.index(client_socket)
-                        sender = nicknames[idx]
-                    except ValueError:
-                        sender = "Unknown"
+                info = clients.get(fileno)
+                sender = info.nickname if info else "Unknown"
 
                 msg = f"🔔 {sender} uploaded file: {os.path.basename(temp_path)} ({size} bytes)\n"
-                broadcast(msg)
+                await broadcast(msg)
                 continue
 
-            # Normal broadcast message
+            # Normal broadcast message. The client coalesces writes, so a file
+            # header can follow chat text in the same read, or be cut off at
+            # the end of it: only send whole lines, and keep the rest for later.
+            idx = data.find(b"\nFILE|")
+            end = idx + 1 if idx >= 0 else data.rfind(b"\n") + 1
+            if end == 0 and len(data) < MAX_LINE:
+                more = await reader.read(BUFFER_SIZE)
+                if more:
+                    pending = data + more
+                    continue
+            if end == 0:
+                # overlong line, or the client left mid-line: send what we have
+                end = len(data)
+            data, pending = data[:end], data[end:]
             try:
                 decoded = data.decode("utf-8")
             except UnicodeDecodeError:
                 decoded = "<Invalid UTF-8 data>"
-            broadcast(decoded)
+            await broadcast(decoded)
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        pass
     finally:
-        remove_client(client_socket)
+        await remove_client(fileno, writer)
 
 
-def receive_file_with_initial(client_socket: socket.socket, filename: str, size: int, initial_bytes: bytes) -> str:
-    """Write `initial_bytes` then read remaining bytes from socket."""
-    ensure_upload_dir()
-    safe_name = os.path.basename(filename)
-    out_path = os.path.join(UPLOAD_DIR, safe_name)
-    remaining = size
-    with open(out_path, "wb") as f:
-        if initial_bytes:
-            f.write(initial_bytes)
-            remaining -= len(initial_bytes)
-        while remaining > 0:
-            chunk = client_socket.recv(min(BUFFER_SIZE, remaining))
-            if not chunk:
-                break
-            f.write(chunk)
-            remaining -= len(chunk)
-    return out_path
+async def remove_client(fileno: int, writer: asyncio.StreamWriter) -> None:
+    """Remove client from `clients` and broadcast leave message."""
+    info = clients.get(fileno)
+    # A closed fileno can be reused by a newer connection before we get here
+    if info is not None and info.writer is writer:
+        del clients[fileno]
+        writer.close()
+        await broadcast(f"⚠️ {info.nickname} left the chat.\n")
 
 
-def remove_client(client_socket: socket.socket) -> None:
-    """Remove client from lists and broadcast leave message."""
-    with lock:
-        if client_socket in clients:
-            idx = clients.index(client_socket)
-            nickname = nicknames[idx]
-            try:
-                clients.remove(client_socket)
-                nicknames.pop(idx)
-                client_socket.close()
-            except Exception:
-                pass
-            broadcast(f"⚠️ {nickname} left the chat.\n")
+async def accept_connections(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Connection callback: ask for a nickname, register the client and serve it."""
+    addr = writer.get_extra_info("peername")
+    print(f"✅ Connected: {addr}")
+    # asyncio transports already disable Nagle (TCP_NODELAY) on TCP sockets
 
+    try:
+        writer.write("NICK\n".encode("utf-8"))
+        await writer.drain()
+        nick = (await reader.read(BUFFER_SIZE)).decode("utf-8").strip()
+    except (ConnectionError, UnicodeDecodeError):
+        writer.close()
+        return
 
-def accept_connections(server_socket: socket.socket) -> None:
-    """Main loop: accept new clients and start a handler thread for each."""
-    print("Server is waiting for connections...")
-    while True:
-        client_socket, addr = server_socket.accept()
-        print(f"✅ Connected: {addr}")
+    # Take the key now: the socket's fileno() reads -1 once the peer has closed it
+    fileno = writer.get_extra_info("socket").fileno()
+    clients[fileno] = ClientInfo(writer, nick)
 
-        client_socket.send("NICK\n".encode("utf-8"))
-        nick = client_socket.recv(BUFFER_SIZE).decode("utf-8").strip()
+    print(f"🎉 Nickname: {nick}")
+    await broadcast(f"🎉 {nick} joined the chat.\n")
+    writer.write("✅ Connected to chat server.\n".encode("utf-8"))
 
-        with lock:
-            clients.append(client_socket)
-            nicknames.append(nick)
+    await handle_client(reader, writer, fileno)
 
-        print(f"🎉 Nickname: {nick}")
-        broadcast(f"🎉 {nick} joined the chat.\n")
-        client_socket.send("✅ Connected to chat server.\n".encode("utf-8"))
 
-        thread = threading.Thread(target=handle_client, args=(client_socket,), daemon=True)
-        thread.start()
+async def serve() -> None:
+    """Bind the listening socket and serve clients until cancelled."""
+    server = await asyncio.start_server(accept_connections, HOST, PORT, backlog=10)
+    assigned_port = server.sockets[0].getsockname()[1]
+    print(f"📡 Chat server running on {HOST}:{assigned_port}")
+    print("Server is waiting for connections...")
+    async with server:
+        await server.serve_forever()
 
 
 def start_server():
-    """Create server socket, bind, and start accepting clients."""
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind((HOST, PORT))
-    assigned_port = server.getsockname()[1]
-    server.listen(10)
-    print(f"📡 Chat server running on {HOST}:{assigned_port}")
-    accept_connections(server)
+    """Run the chat server on a single-threaded event loop."""
+    asyncio.run(serve())
 
 
 if __name__ == "__main__":
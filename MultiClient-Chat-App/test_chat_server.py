@@ -0,0 +1,85 @@
+"""
+Tests for chat_server's message framing.
+Run from this folder with:  python -m unittest test_chat_server
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import chat_server
+
+
+class FakeWriter:
+    """Collects what the server writes to one client."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, payload: bytes):
+        self.data += payload
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class HandleClientFramingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.upload_dir = chat_server.UPLOAD_DIR
+        chat_server.UPLOAD_DIR = self.tmp.name
+        self.sender = FakeWriter()
+        self.receiver = FakeWriter()
+        chat_server.clients.clear()
+        chat_server.clients[1] = chat_server.ClientInfo(self.sender, "alice")
+        chat_server.clients[2] = chat_server.ClientInfo(self.receiver, "bob")
+
+    def tearDown(self):
+        chat_server.clients.clear()
+        chat_server.UPLOAD_DIR = self.upload_dir
+        self.tmp.cleanup()
+
+    async def run_client(self, stream: bytes) -> str:
+        """Feed `stream` as alice's connection and return what bob received."""
+        reader = asyncio.StreamReader()
+        reader.feed_data(stream)
+        reader.feed_eof()
+        await chat_server.handle_client(reader, self.sender, 1)
+        return self.receiver.data.decode("utf-8")
+
+    async def test_header_split_across_reads(self):
+        line = b"alice: " + b"x" * (chat_server.BUFFER_SIZE - 11) + b"\n"
+        payload = b"0123456789abcde"
+        # The first read ends in the middle of "FILE|"
+        self.assertEqual(len(line) + 3, chat_server.BUFFER_SIZE)
+        received = await self.run_client(line + b"FILE|f2.bin|15\n" + payload + b"alice: after\n")
+
+        self.assertIn(line.decode(), received)
+        self.assertIn("uploaded file: f2.bin (15 bytes)", received)
+        self.assertIn("alice: after\n", received)
+        self.assertNotIn("FILE|", received)
+        self.assertNotIn(payload.decode(), received)
+        with open(os.path.join(self.tmp.name, "f2.bin"), "rb") as f:
+            self.assertEqual(f.read(), payload)
+
+    async def test_header_after_text_in_same_read(self):
+        received = await self.run_client(b"alice: hi\nFILE|t.bin|3\nabcalice: bye\n")
+
+        self.assertIn("alice: hi\n", received)
+        self.assertIn("uploaded file: t.bin (3 bytes)", received)
+        self.assertIn("alice: bye\n", received)
+        self.assertNotIn("abc", received)
+
+    async def test_negative_size_is_rejected(self):
+        received = await self.run_client(b"FILE|x|-1\n")
+
+        self.assertEqual(self.sender.data, b"ERROR|Invalid file size\n")
+        self.assertNotIn("uploaded file", received)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,12 +10,55 @@ File Sharing Client
 """
 
 import socket
+import errno
+import mmap
 import os
+import select
+import struct
 import sys
 
+from transfer_utils import corked
+
 HOST = "127.0.0.1"
 PORT = 0  # prompt user
 BUFFER_SIZE = 4096
+BULK_BUFFER = 1 << 16  # recv size for file payloads
+ZEROCOPY_MIN = 16 * 1024  # smaller uploads are cheaper to copy than to pin
+# Linux values; older Pythons do not export them from the socket module
+SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+SO_EE_ORIGIN_ZEROCOPY = 5
+SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")  # struct sock_extended_err
+
+
+class BufferedSocketReader:
+    """
+    Read a response line from a socket with one recv() per BUFFER_SIZE bytes
+    instead of one per byte. Payload bytes read past the newline stay buffered.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buf = bytearray()
+
+    def readline(self) -> bytes:
+        """Return the next line including its newline, or b"" on disconnect."""
+        while True:
+            idx = self.buf.find(b"\n")
+            if idx != -1:
+                line = bytes(self.buf[:idx + 1])
+                del self.buf[:idx + 1]
+                return line
+            chunk = self.sock.recv(BUFFER_SIZE)
+            if not chunk:
+                return b""
+            self.buf += chunk
+
+    def take(self, size: int) -> bytes:
+        """Remove and return up to `size` already-buffered bytes."""
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
 
 
 def prompt_server_port():
@@ -28,6 +71,87 @@ def prompt_server_port():
             sys.exit(1)
 
 
+def enable_zerocopy(sock: socket.socket) -> None:
+    """Opt the socket in to MSG_ZEROCOPY sends (Linux 4.14+); ignored elsewhere."""
+    if sys.platform.startswith("linux"):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+        except OSError:
+            pass
+
+
+def zerocopy_enabled(sock: socket.socket) -> bool:
+    """Return True if enable_zerocopy() took effect on this socket."""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return bool(sock.getsockopt(socket.SOL_SOCKET, SO_ZEROCOPY))
+    except OSError:
+        return False
+
+
+def wait_zerocopy_completions(sock: socket.socket, sends: int, timeout: float = 1.0) -> None:
+    """
+    Drain the socket error queue until the kernel has reported that it is
+    done with the pages of `sends` MSG_ZEROCOPY calls. Each notification
+    covers a range of calls, so this is usually a single recvmsg().
+    """
+    poller = select.poll()
+    poller.register(sock, select.POLLERR)
+    done = 0
+    while done < sends:
+        try:
+            _, ancdata, _, _ = sock.recvmsg(0, socket.CMSG_SPACE(SOCK_EXTENDED_ERR.size), socket.MSG_ERRQUEUE)
+        except BlockingIOError:
+            # Nothing queued yet; POLLERR fires once a notification arrives
+            if not poller.poll(timeout * 1000):
+                return
+            continue
+        for _level, _type, data in ancdata:
+            _errno, origin, _type, _code, _pad, lo, hi = SOCK_EXTENDED_ERR.unpack_from(data)
+            if origin == SO_EE_ORIGIN_ZEROCOPY:
+                done += hi - lo + 1
+
+
+def send_with_header(sock: socket.socket, header: bytes, f, size: int, flags: int = 0) -> int:
+    """
+    Send the UPLOAD| `header` and an mmap of the open file `f` as one
+    scatter-gather sendmsg() batch (two sendall() calls where sendmsg()
+    is missing). `flags` may include MSG_ZEROCOPY; the return value is the
+    number of sendmsg() calls that used it, for wait_zerocopy_completions().
+    """
+    if size == 0:
+        sock.sendall(header)
+        return 0
+    zerocopy_sends = 0
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if not hasattr(sock, "sendmsg"):
+            sock.sendall(header)
+            sock.sendall(mm)
+            return 0
+        buffers = [memoryview(header), memoryview(mm)]
+        while buffers:
+            try:
+                sent = sock.sendmsg(buffers, [], flags)
+            except OSError as e:
+                if not flags & MSG_ZEROCOPY or e.errno != errno.ENOBUFS:
+                    raise
+                # Out of memory for pinned pages; copy the rest instead
+                flags &= ~MSG_ZEROCOPY
+                continue
+            if flags & MSG_ZEROCOPY:
+                zerocopy_sends += 1
+            # drop fully sent buffers and trim the partially sent one
+            while sent:
+                if sent >= len(buffers[0]):
+                    sent -= len(buffers[0])
+                    buffers.pop(0).release()
+                else:
+                    buffers[0] = buffers[0][sent:]
+                    sent = 0
+    return zerocopy_sends
+
+
 def upload(sock: socket.socket, local_path: str):
     if not os.path.isfile(local_path):
         print("⚠️ Local file not found.")
@@ -35,10 +159,11 @@ def upload(sock: socket.socket, local_path: str):
     filename = os.path.basename(local_path)
     size = os.path.getsize(local_path)
     header = f"UPLOAD|{filename}|{size}\n".encode("utf-8")
-    sock.sendall(header)
-    with open(local_path, "rb") as f:
-        while chunk := f.read(BUFFER_SIZE):
-            sock.sendall(chunk)
+    flags = MSG_ZEROCOPY if size >= ZEROCOPY_MIN and zerocopy_enabled(sock) else 0
+    with corked(sock), open(local_path, "rb") as f:
+        zerocopy_sends = send_with_header(sock, header, f, size, flags)
+    if zerocopy_sends:
+        wait_zerocopy_completions(sock, zerocopy_sends)
     resp = sock.recv(BUFFER_SIZE).decode("utf-8").strip()
     print("Server:", resp)
 
@@ -46,25 +171,25 @@ def upload(sock: socket.socket, local_path: str):
 def download(sock: socket.socket, filename: str):
     header = f"DOWNLOAD|{filename}\n".encode("utf-8")
     sock.sendall(header)
-    resp = b""
     # read single line response (FOUND|size or NOTFOUND)
-    while b"\n" not in resp:
-        chunk = sock.recv(1)
-        if not chunk:
-            print("No response.")
-            return
-        resp += chunk
+    reader = BufferedSocketReader(sock)
+    resp = reader.readline()
+    if not resp:
+        print("No response.")
+        return
     line = resp.decode("utf-8").strip()
     if line == "NOTFOUND":
         print("⚠️ File not found on server.")
         return
     if line.startswith("FOUND|"):
         size = int(line.split("|", 1)[1])
-        remaining = size
+        initial_bytes = reader.take(size)
+        remaining = size - len(initial_bytes)
         out_path = os.path.join(os.getcwd(), filename)
         with open(out_path, "wb") as f:
+            f.write(initial_bytes)
             while remaining > 0:
-                chunk = sock.recv(min(BUFFER_SIZE, remaining))
+                chunk = sock.recv(min(BULK_BUFFER, remaining))
                 if not chunk:
                     break
                 f.write(chunk)
@@ -95,6 +220,8 @@ def interactive_client():
     prompt_server_port()
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.connect((HOST, PORT))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    enable_zerocopy(s)
     print("Connected to file server.")
     try:
         while True:
@@ -2,100 +2,213 @@
 File Sharing Server
 -------------------
 - Multi-client server: supports upload and download commands.
+- Clients are served concurrently on a single-threaded asyncio event loop.
+- WORKERS processes share the port via SO_REUSEPORT so the kernel spreads
+  incoming connections across them (one process where it is unsupported).
 - Protocol (text control lines, then raw bytes):
     UPLOAD|<filename>|<size>\n  -> then <size> bytes follow
     DOWNLOAD|<filename>\n      -> server responds FOUND|<size>\n then <size> bytes; or NOTFOUND\n
 - Files saved under 'shared/' directory.
 """
 
+import asyncio
 import socket
-import threading
+import multiprocessing
 import os
+import signal
+import threading
+
+from transfer_utils import corked
 
 HOST = "127.0.0.1"
 PORT = 0  # OS picks free port
-BUFFER_SIZE = 4096
+SPOOL_SIZE = 1 << 20  # upload bytes buffered in memory between disk writes
+WORKERS = os.cpu_count() or 1  # listener processes sharing the port
+PARENT_CHECK_INTERVAL = 1.0  # seconds between a worker's checks that the server is still up
+SENDFILE_MIN = 64 * 1024  # smaller downloads go out in one write with their header
 SHARED_DIR = os.path.join(os.path.dirname(__file__), "shared")
-lock = threading.Lock()
 
 
 def ensure_shared_dir():
     os.makedirs(SHARED_DIR, exist_ok=True)
 
 
-def recv_all(sock: socket.socket, size: int) -> bytes:
-    """Receive exactly size bytes from socket."""
-    data = b""
-    while len(data) < size:
-        packet = sock.recv(min(BUFFER_SIZE, size - len(data)))
-        if not packet:
-            break
-        data += packet
-    return data
+async def receive_file(reader: asyncio.StreamReader, save_path: str, size: int) -> int:
+    """
+    Write the next `size` upload bytes from reader to save_path, flushing a
+    SPOOL_SIZE buffer to disk each time it fills. Returns how many bytes
+    arrived, which is less than size if the client disconnected.
+    """
+    buf = bytearray(min(size, SPOOL_SIZE))
+    filled = 0
+    remaining = size
+    with open(save_path, "wb") as f, memoryview(buf) as view:
+        while remaining > 0:
+            chunk = await reader.read(min(len(buf) - filled, remaining))
+            if not chunk:
+                break
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            remaining -= len(chunk)
+            if filled == len(buf):
+                f.write(view)
+                filled = 0
+        f.write(view[:filled])
+    return size - remaining
 
 
-def handle_client(conn: socket.socket, addr):
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
     """Per-client loop to process upload/download commands."""
+    addr = writer.get_extra_info("peername")
+    conn = writer.get_extra_info("socket")
+    # asyncio transports already disable Nagle (TCP_NODELAY) on TCP sockets
     print(f"🟢 Client connected: {addr}")
     try:
         while True:
-            header = b""
-            # Read until newline
-            while b"\n" not in header:
-                chunk = conn.recv(1)
-                if not chunk:
-                    return
-                header += chunk
+            try:
+                header = await reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError:
+                return
             header_line = header.decode("utf-8").strip()
             if header_line.startswith("UPLOAD|"):
                 # UPLOAD|filename|size
                 _, filename, size_str = header_line.split("|", 2)
-                size = int(size_str)
-                print(f"⬆️ Upload request: {filename} ({size} bytes) from {addr}")
-                file_bytes = recv_all(conn, size)
-                safe_name = os.path.basename(filename)
-                save_path = os.path.join(SHARED_DIR, safe_name)
-                with open(save_path, "wb") as f:
-                    f.write(file_bytes)
-                conn.sendall(f"OK|{safe_name}\n".encode("utf-8"))
+                try:
+                    size = int(size_str)
+                except ValueError:
+                    size = -1
+                if size < 0:
+                    writer.write(b"ERROR|Invalid file size\n")
+                else:
+                    print(f"⬆️ Upload request: {filename} ({size} bytes) from {addr}")
+                    safe_name = os.path.basename(filename)
+                    save_path = os.path.join(SHARED_DIR, safe_name)
+                    if await receive_file(reader, save_path, size) < size:
+                        # Client went away mid-upload; don't leave a truncated file behind
+                        os.remove(save_path)
+                        return
+                    writer.write(f"OK|{safe_name}\n".encode("utf-8"))
 
             elif header_line.startswith("DOWNLOAD|"):
                 _, filename = header_line.split("|", 1)
                 safe_name = os.path.basename(filename)
                 file_path = os.path.join(SHARED_DIR, safe_name)
                 if not os.path.isfile(file_path):
-                    conn.sendall(b"NOTFOUND\n")
+                    writer.write(b"NOTFOUND\n")
                 else:
                     size = os.path.getsize(file_path)
-                    conn.sendall(f"FOUND|{size}\n".encode("utf-8"))
-                    with open(file_path, "rb") as f:
-                        while chunk := f.read(BUFFER_SIZE):
-                            conn.sendall(chunk)
+                    header = f"FOUND|{size}\n".encode("utf-8")
+                    # Send exactly the advertised size even if the file changes meanwhile;
+                    # if it shrank, drop the connection rather than leave the client waiting
+                    if size < SENDFILE_MIN:
+                        # Header and body in one batch (a single sendmsg() on Python 3.12+)
+                        with open(file_path, "rb") as f:
+                            body = f.read(size)
+                        if len(body) < size:
+                            return
+                        writer.writelines([header, body])
+                    else:
+                        with corked(conn), open(file_path, "rb") as f:
+                            writer.write(header)
+                            # Uses os.sendfile() where possible, else a read/write loop
+                            sent = await asyncio.get_running_loop().sendfile(writer.transport, f, 0, size)
+                        if sent < size:
+                            return
             elif header_line == "LIST":
                 # send list of files, newline separated, end with DONE
                 files = os.listdir(SHARED_DIR)
                 payload = "\n".join(files) + "\nDONE\n"
-                conn.sendall(payload.encode("utf-8"))
+                writer.write(payload.encode("utf-8"))
             else:
                 # Unknown command
-                conn.sendall(b"ERROR|Unknown command\n")
+                writer.write(b"ERROR|Unknown command\n")
+            await writer.drain()
     except Exception as e:
         print("Client handler error:", e)
     finally:
-        conn.close()
+        writer.close()
         print(f"🔴 Client disconnected: {addr}")
 
 
-def start_server():
-    ensure_shared_dir()
+def create_listener(port: int) -> socket.socket:
+    """Create a listening socket that other workers may also bind (SO_REUSEPORT)."""
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server.bind((HOST, PORT))
-    assigned_port = server.getsockname()[1]
+    if hasattr(socket, "SO_REUSEPORT"):
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    server.bind((HOST, port))
     server.listen(10)
+    return server
+
+
+async def serve(server_socket: socket.socket):
+    """Serve clients from an already listening socket until cancelled."""
+    server = await asyncio.start_server(handle_client, sock=server_socket)
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_worker(port: int, parent_pid: int):
+    """Serve clients on a fresh listener until the parent server process is gone."""
+    server = await asyncio.start_server(handle_client, sock=create_listener(port))
+    # An orphaned worker would keep taking its share of the port's connections
+    while os.getppid() == parent_pid:
+        await asyncio.sleep(PARENT_CHECK_INTERVAL)
+    server.close()
+
+
+def accept_loop(port: int, parent_pid: int):
+    """Worker process entry point: its own listener on the shared port."""
+    try:
+        asyncio.run(serve_worker(port, parent_pid))
+    except KeyboardInterrupt:
+        pass
+
+
+class Terminated(BaseException):
+    """Raised from the SIGTERM handler to unwind start_server()."""
+
+
+def raise_terminated(signum, frame):
+    raise Terminated
+
+
+def start_server():
+    ensure_shared_dir()
+    listener = create_listener(PORT)
+    assigned_port = listener.getsockname()[1]
     print(f"📡 File server running on {HOST}:{assigned_port}")
-    while True:
-        conn, addr = server.accept()
-        threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
+    workers = WORKERS if hasattr(socket, "SO_REUSEPORT") else 1
+    # Catch `kill` so the workers are stopped before this process exits
+    # (only the main thread may install signal handlers)
+    catch_sigterm = workers > 1 and threading.current_thread() is threading.main_thread()
+    if catch_sigterm:
+        previous_sigterm = signal.signal(signal.SIGTERM, raise_terminated)
+    # This process is the first worker; the rest bind the port it was given
+    # Spawned, not forked, so workers do not inherit this process's listener
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=accept_loop, args=(assigned_port, os.getpid()), daemon=True)
+        for _ in range(workers - 1)
+    ]
+    terminated = False
+    try:
+        for proc in processes:
+            proc.start()
+        asyncio.run(serve(listener))
+    except Terminated:
+        terminated = True
+    finally:
+        # Workers must not outlive the server when it was started from main.py
+        for proc in processes:
+            if proc.pid is not None:
+                proc.terminate()
+                proc.join()
+        if catch_sigterm:
+            signal.signal(signal.SIGTERM, previous_sigterm or signal.SIG_DFL)
+    if terminated:
+        # Hand the signal to whatever handled it before (by default: exit),
+        # so a launcher such as main.py stops too instead of going back to its menu
+        os.kill(os.getpid(), signal.SIGTERM)
 
 
 if __name__ == "__main__":
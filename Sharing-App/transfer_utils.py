@@ -0,0 +1,25 @@
+"""
+Socket helpers shared by file_server.py and file_client.py.
+"""
+
+import contextlib
+import socket
+
+
+@contextlib.contextmanager
+def corked(sock: socket.socket):
+    """
+    Hold back partial segments while a bulk transfer is written so the
+    kernel only emits full-sized packets (Linux TCP_CORK). Nagle is turned
+    back off when the cork is released. No-op where TCP_CORK is missing.
+    """
+    if not hasattr(socket, "TCP_CORK"):
+        yield
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 0)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1)
+    try:
+        yield
+    finally:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 0)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
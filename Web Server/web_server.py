@@ -10,15 +10,29 @@ Web Server: static files + upload + gallery
 
 import socket
 import os
+import stat
+import functools
 import mimetypes
 import urllib.parse
+from dataclasses import dataclass
 
 HOST = "127.0.0.1"
 PORT = 0  # OS picks free port
 BASE_DIR = os.path.dirname(__file__)
 WEB_ROOT = os.path.join(BASE_DIR, "public")
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
-BUFFER_SIZE = 8192
+UPLOAD_CHUNK = 64 * 1024  # recv size while streaming upload bodies
+PART_HEADER_LIMIT = 1 << 20  # max body bytes scanned for the file part's headers
+STATIC_CACHE_FILE_LIMIT = 64 * 1024  # files up to this size are served from memory
+STATIC_CACHE_LIMIT = 8 << 20  # total bytes of responses kept in STATIC_CACHE
+
+# path -> (full response bytes, mtime_ns, file size); insertion order doubles as eviction order
+STATIC_CACHE = {}
+
+# Pre-encoded response header fragments
+HDR_200 = b"HTTP/1.1 200 OK\r\nContent-Type: "
+HDR_CONTENT_LENGTH = b"\r\nContent-Length: "
+HDR_END = b"\r\nConnection: close\r\n\r\n"
 
 
 def ensure_dirs():
@@ -26,11 +40,16 @@ def ensure_dirs():
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-def guess_mime(path: str) -> str:
-    m, _ = mimetypes.guess_type(path)
+@functools.lru_cache(maxsize=128)
+def mime_for_ext(ext: str) -> str:
+    m, _ = mimetypes.guess_type("file" + ext)
     return m or "application/octet-stream"
 
 
+def guess_mime(path: str) -> str:
+    return mime_for_ext(os.path.splitext(path)[1].lower())
+
+
 def read_request(client: socket.socket) -> bytes:
     """
     Read the incoming HTTP request header (until double CRLF).
@@ -45,33 +64,166 @@ def read_request(client: socket.socket) -> bytes:
     return data
 
 
-def parse_headers(header_bytes: bytes) -> dict:
-    text = header_bytes.decode("utf-8", errors="ignore")
-    lines = text.split("\r\n")
-    request_line = lines[0] if lines else ""
+class BufferedSocketReader:
+    """
+    Buffer a request body from a socket without reading past Content-Length.
+    Callers consume bytes from `buf` and call fill() when they need more.
+    Boundary scans use bytearray.find(), which already runs in C (memchr or
+    CPython's fastsearch); Python code runs once per chunk, not per byte,
+    so a compiled (e.g. Cython) scanner would have nothing left to speed up.
+    """
+
+    def __init__(self, sock: socket.socket, initial_bytes: bytes, content_length: int):
+        self.sock = sock
+        self.buf = bytearray(initial_bytes[:content_length])
+        self.remaining = content_length - len(self.buf)
+
+    def fill(self) -> bool:
+        """Append the next chunk of the body to `buf`; False once it is exhausted."""
+        if self.remaining <= 0:
+            return False
+        chunk = self.sock.recv(min(UPLOAD_CHUNK, self.remaining))
+        if not chunk:
+            self.remaining = 0
+            return False
+        self.buf += chunk
+        self.remaining -= len(chunk)
+        return True
+
+    def read_until(self, marker: bytes, start: int = 0) -> int:
+        """Fill until `marker` is in `buf` at or after `start`; return its index or -1."""
+        while True:
+            idx = self.buf.find(marker, start)
+            if idx != -1:
+                return idx
+            start = max(start, len(self.buf) - len(marker) + 1)
+            if len(self.buf) > PART_HEADER_LIMIT or not self.fill():
+                return -1
+
+    def copy_until(self, marker: bytes, out) -> bool:
+        """
+        Write body bytes to `out` up to `marker` and drop the marker. Only the
+        last len(marker) - 1 bytes are held back between reads, in case the
+        marker straddles two chunks. Returns False if the body ended first.
+        """
+        keep = len(marker) - 1
+        while True:
+            idx = self.buf.find(marker)
+            if idx != -1:
+                with memoryview(self.buf) as view:
+                    out.write(view[:idx])
+                del self.buf[:idx + len(marker)]
+                return True
+            cut = len(self.buf) - keep
+            if cut > 0:
+                with memoryview(self.buf) as view:
+                    out.write(view[:cut])
+                del self.buf[:cut]
+            if not self.fill():
+                out.write(self.buf)
+                self.buf.clear()
+                return False
+
+    def drain(self):
+        """Discard the rest of the body so closing the socket does not reset it."""
+        self.buf.clear()
+        while self.fill():
+            self.buf.clear()
+
+
+@dataclass
+class Request:
+    """Parsed request line and headers, kept as bytes until a handler needs text."""
+    method: bytes
+    path: bytes
+    headers: dict[bytes, bytes]
+
+
+def parse_headers(header_bytes: bytes) -> Request:
+    # Body bytes may follow the blank line; they are not headers.
+    # split()/partition() do the scanning in C, one call per line.
+    head = header_bytes.split(b"\r\n\r\n", 1)[0]
+    lines = head.split(b"\r\n")
+    method, _, rest = lines[0].partition(b" ")
+    path = rest.split(b" ", 1)[0]
     headers = {}
     for line in lines[1:]:
-        if ":" in line:
-            k, v = line.split(":", 1)
+        k, sep, v = line.partition(b":")
+        if sep:
             headers[k.strip().lower()] = v.strip()
-    return {"request_line": request_line, "headers": headers, "raw": text}
+    return Request(method, path, headers)
+
+
+def build_headers(status: str, content_type: str, length: int) -> bytes:
+    if status == "200 OK":
+        status_line = HDR_200
+    else:
+        status_line = b"HTTP/1.1 " + status.encode("utf-8") + b"\r\nContent-Type: "
+    return b"".join([
+        status_line,
+        content_type.encode("utf-8"),
+        HDR_CONTENT_LENGTH,
+        str(length).encode("ascii"),
+        HDR_END,
+    ])
 
 
 def send_response(client: socket.socket, status: str, content: bytes, content_type: str = "text/html"):
-    headers = (
-        f"HTTP/1.1 {status}\r\n"
-        f"Content-Type: {content_type}\r\n"
-        f"Content-Length: {len(content)}\r\n"
-        "Connection: close\r\n"
-        "\r\n"
-    ).encode("utf-8")
-    client.sendall(headers + content)
-
-
-def handle_get(path: str, client: socket.socket):
-    if path == "/":
-        path = "/index.html"
-    if path == "/gallery":
+    client.sendall(build_headers(status, content_type, len(content)) + content)
+
+
+def send_file_response(client: socket.socket, status: str, f, size: int, content_type: str):
+    """
+    Send headers, then let socket.sendfile() stream the open file `f` from
+    the page cache, so memory use does not grow with the file size.
+    """
+    client.sendall(build_headers(status, content_type, size))
+    client.sendfile(f, 0, size)
+
+
+def cache_static(fpath: str, response: bytes, mtime_ns: int, size: int):
+    """Remember a small file's full response, evicting the oldest entries to stay under STATIC_CACHE_LIMIT."""
+    STATIC_CACHE.pop(fpath, None)
+    total = sum(len(entry[0]) for entry in STATIC_CACHE.values()) + len(response)
+    while STATIC_CACHE and total > STATIC_CACHE_LIMIT:
+        oldest = next(iter(STATIC_CACHE))
+        total -= len(STATIC_CACHE.pop(oldest)[0])
+    STATIC_CACHE[fpath] = (response, mtime_ns, size)
+
+
+def serve_file(client: socket.socket, fpath: str) -> bool:
+    """
+    Send a regular file as a 200 response; return False if there is none.
+    Small files are kept in STATIC_CACHE as ready-made responses (headers
+    included) and revalidated with a single stat() per request; larger
+    ones are streamed with sendfile().
+    """
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    cached = STATIC_CACHE.get(fpath)
+    if cached and cached[1] == st.st_mtime_ns and cached[2] == st.st_size:
+        client.sendall(cached[0])
+        return True
+    mime = guess_mime(fpath)
+    with open(fpath, "rb") as f:
+        if st.st_size > STATIC_CACHE_FILE_LIMIT:
+            send_file_response(client, "200 OK", f, st.st_size, mime)
+            return True
+        body = f.read()
+    response = build_headers("200 OK", mime, len(body)) + body
+    cache_static(fpath, response, st.st_mtime_ns, st.st_size)
+    client.sendall(response)
+    return True
+
+
+def handle_get(path: bytes, client: socket.socket):
+    if path == b"/":
+        path = b"/index.html"
+    if path == b"/gallery":
         files = os.listdir(UPLOAD_DIR)
         body = "<h1>Uploads Gallery</h1><ul>"
         for fn in files:
@@ -82,73 +234,52 @@ def handle_get(path: str, client: socket.socket):
         return
 
     # Serve uploads prefixed path /uploads/...
-    if path.startswith("/uploads/"):
-        filename = path[len("/uploads/"):]
+    if path.startswith(b"/uploads/"):
+        filename = path[len(b"/uploads/"):].decode("utf-8", errors="ignore")
         filename = urllib.parse.unquote(filename)
         fpath = os.path.join(UPLOAD_DIR, filename)
-        if os.path.isfile(fpath):
-            with open(fpath, "rb") as f:
-                data = f.read()
-            send_response(client, "200 OK", data, guess_mime(fpath))
-            return
-        else:
+        if not serve_file(client, fpath):
             send_response(client, "404 Not Found", b"<h1>404 Not Found</h1>")
-            return
+        return
 
-    file_path = os.path.join(WEB_ROOT, path.lstrip("/"))
-    if os.path.isfile(file_path):
-        with open(file_path, "rb") as f:
-            data = f.read()
-        send_response(client, "200 OK", data, guess_mime(file_path))
-    else:
+    file_path = os.path.join(WEB_ROOT, path.decode("utf-8", errors="ignore").lstrip("/"))
+    if not serve_file(client, file_path):
         send_response(client, "404 Not Found", b"<h1>404 Not Found</h1>")
 
 
-def handle_post(request_info: dict, client: socket.socket, initial_bytes: bytes):
-    req_line = request_info["request_line"]
-    parts = req_line.split(" ")
-    if len(parts) < 2:
+def handle_post(request: Request, client: socket.socket, initial_bytes: bytes):
+    if not request.path:
         send_response(client, "400 Bad Request", b"<h1>400 Bad Request</h1>")
         return
-    path = parts[1]
-    headers = request_info["headers"]
-    content_type = headers.get("content-type", "")
-    content_length = int(headers.get("content-length", "0"))
+    content_type = request.headers.get(b"content-type", b"")
+    content_length = int(request.headers.get(b"content-length", b"0"))
 
     # Only handle multipart/form-data for /upload
-    if path == "/upload" and "multipart/form-data" in content_type:
-        boundary = content_type.split("boundary=")[1]
+    if request.path == b"/upload" and b"multipart/form-data" in content_type:
+        boundary = content_type.split(b"boundary=")[1]
         # initial_bytes contains header + maybe some body bytes; extract body start
         sep = b"\r\n\r\n"
         pos = initial_bytes.find(sep)
-        body = initial_bytes[pos+4:] if pos != -1 else b""
-        remaining = content_length - len(body)
-        while remaining > 0:
-            chunk = client.recv(min(BUFFER_SIZE, remaining))
-            if not chunk:
-                break
-            body += chunk
-            remaining -= len(chunk)
-
-        # Very simplified multipart parser: find filename and content
-        # Search for filename="..."\r\n\r\n then file bytes until boundary
+        body = BufferedSocketReader(client, initial_bytes[pos+4:] if pos != -1 else b"", content_length)
+
+        # Very simplified streaming multipart parser: find filename="..."
+        # and the blank line after it, then copy file bytes to disk until the boundary
         fname_marker = b'filename="'
-        idx = body.find(fname_marker)
-        if idx == -1:
+        idx = body.read_until(fname_marker)
+        end = body.read_until(b'"', idx + len(fname_marker)) if idx != -1 else -1
+        file_start = body.read_until(sep, end) if end != -1 else -1
+        if file_start == -1:
+            body.drain()
             send_response(client, "400 Bad Request", b"<h1>No file in upload</h1>")
             return
-        start = idx + len(fname_marker)
-        end = body.find(b'"', start)
-        filename = body[start:end].decode("utf-8")
-        # find start of file bytes
-        file_start = body.find(b"\r\n\r\n", end) + 4
-        boundary_bytes = ("--" + boundary).encode("utf-8")
-        file_end = body.rfind(boundary_bytes) - 2  # strip trailing \r\n before boundary
-        file_content = body[file_start:file_end]
+        filename = body.buf[idx + len(fname_marker):end].decode("utf-8")
+        del body.buf[:file_start + len(sep)]
+        boundary_bytes = b"\r\n--" + boundary  # file bytes end at CRLF + boundary
         safe_name = os.path.basename(filename)
         save_path = os.path.join(UPLOAD_DIR, safe_name)
         with open(save_path, "wb") as f:
-            f.write(file_content)
+            body.copy_until(boundary_bytes, f)
+        body.drain()
         resp_body = f"<h1>Uploaded {safe_name}</h1><p><a href='/gallery'>Gallery</a></p>".encode("utf-8")
         send_response(client, "200 OK", resp_body)
     else:
@@ -186,13 +317,11 @@ def start_server():
             if not header_bytes:
                 client.close()
                 continue
-            req_info = parse_headers(header_bytes)
-            method = req_info["request_line"].split(" ")[0]
-            if method == "GET":
-                path = req_info["request_line"].split(" ")[1]
-                handle_get(path, client)
-            elif method == "POST":
-                handle_post(req_info, client, header_bytes)
+            request = parse_headers(header_bytes)
+            if request.method == b"GET":
+                handle_get(request.path, client)
+            elif request.method == b"POST":
+                handle_post(request, client, header_bytes)
             else:
                 send_response(client, "405 Method Not Allowed", b"<h1>405</h1>")
         except Exception as e:
@@ -1,5 +1,8 @@
-import subprocess
+import importlib
 import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 MENU = """
 🔹 Networking Projects Launcher 🔹
@@ -13,31 +16,45 @@ Choose an option:
 0. Exit
 """
 
-def run_script(path):
-    """Run a Python script in the same interpreter."""
+# choice -> (project folder, module name, entry point)
+SCRIPTS = {
+    "1": ("MultiClient-Chat-App", "chat_server", "start_server"),
+    "2": ("MultiClient-Chat-App", "chat_client", "main"),
+    "3": ("Sharing-App", "file_server", "start_server"),
+    "4": ("Sharing-App", "file_client", "interactive_client"),
+    "5": ("Web Server", "web_server", "start_server"),
+}
+
+
+def run_script(folder, module_name, entry):
+    """Import a project script and run its entry point in this interpreter."""
+    path = os.path.join(BASE_DIR, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
     try:
-        subprocess.run(["python", path])
+        if module_name in sys.modules:
+            # Reload so module globals (e.g. a prompted PORT) start fresh each run
+            module = importlib.reload(sys.modules[module_name])
+        else:
+            module = importlib.import_module(module_name)
+        getattr(module, entry)()
     except KeyboardInterrupt:
         print("\n⛔ Process stopped.")
-    except FileNotFoundError:
-        print(f"❌ Error: {path} not found.")
+    except SystemExit:
+        # scripts exit on bad input; return to the menu instead
+        pass
+    except ModuleNotFoundError as e:
+        if e.name != module_name:
+            raise
+        print(f"❌ Error: {os.path.join(path, module_name + '.py')} not found.")
 
 def main():
-    base = os.path.dirname(__file__)
     while True:
         print(MENU)
         choice = input("Enter choice: ").strip()
-        
-        if choice == "1":
-            run_script(os.path.join(base, "MultiClient-Chat-App", "chat_server.py"))
-        elif choice == "2":
-            run_script(os.path.join(base, "MultiClient-Chat-App", "chat_client.py"))
-        elif choice == "3":
-            run_script(os.path.join(base, "Sharing-App", "file_server.py"))
-        elif choice == "4":
-            run_script(os.path.join(base, "Sharing-App", "file_client.py"))
-        elif choice == "5":
-            run_script(os.path.join(base, "Web Server", "web_server.py"))
+
+        if choice in SCRIPTS:
+            run_script(*SCRIPTS[choice])
         elif choice == "0":
             print("👋 Exiting. Bye!")
             break